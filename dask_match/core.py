@@ -1,71 +1,158 @@
 import functools
-import math
-import numbers
+import inspect
 import operator
-from collections.abc import Iterator
+import weakref
 
-import toolz
+import numpy as np
 from dask.base import DaskMethodsMixin, named_schedulers, normalize_token, tokenize
+from dask.core import ishashable
 from dask.dataframe.core import _concat, is_dataframe_like
 from dask.utils import M, apply, funcname
-from matchpy import (
-    Arity,
-    CustomConstraint,
-    Operation,
-    Pattern,
-    ReplacementRule,
-    Wildcard,
-    replace_all,
-)
-from matchpy.expressions.expressions import _OperationMeta
 
-replacement_rules = []
+_no_default = object()
 
+# Parameters that replace the attributes of the same name on `Expr`, as when
+# `from_graph` is given its `_meta` and `divisions` directly
+_forwarded_parameters = {"columns", "npartitions", "divisions", "_meta", "_name"}
 
-class _ExprMeta(_OperationMeta):
-    """Metaclass to determine Operation behavior
 
-    Matchpy overrides `__call__` so that `__init__` doesn't behave as expected.
-    This is gross, but has some logic behind it.  We need to enforce that
-    expressions can be easily replayed.  Eliminating `__init__` is one way to
-    do this.  It forces us to compute things lazily rather than at
-    initialization.
+class _ExprMeta(type):
+    """Metaclass to determine Expr construction behavior
 
-    We motidify Matchpy's implementation so that we can handle keywords and
-    default values more cleanly.
+    We need to enforce that expressions can be easily replayed from their
+    operands alone.  Rather than let subclasses define `__init__` we construct
+    every expression here from its parameters.  This forces us to compute
+    things lazily rather than at initialization.
 
-    We also collect replacement rules here.
+    We handle keywords and default values here, so that by the time we reach
+    `Expr.__init__` we have a full list of operands, one per parameter.
+
+    Each parameter is exposed as a property that indexes straight into
+    `operands`, so that `expr.frame` is as cheap as `expr.operands[0]`.
+    We also compute the prefix of our names, the default operands and the
+    position of each parameter once per class, here, rather than on every
+    construction.
+
+    We also hash-cons expressions.  Structurally equal expressions share the
+    same name, and so we hand back the existing instance when there is one.
+    We compute the name from the operands before building anything, so a
+    hit costs no allocation.  This lets equal subexpressions share cached
+    state like `_name` and `_meta`, and lets us compare them with `is`.
     """
 
-    seen = set()
+    _instances = weakref.WeakValueDictionary()
+
+    def __init__(cls, name, bases, dct, **kwargs):
+        super().__init__(name, bases, dct, **kwargs)
+        for i, parameter in enumerate(cls._parameters):
+            if parameter in dct:
+                continue
+            # Don't hide inherited API like `Expr.dtypes` with an operand
+            inherited = inspect.getattr_static(cls, parameter, _no_default)
+            if (
+                inherited is _no_default
+                or isinstance(inherited, _OperandProperty)
+                or parameter in _forwarded_parameters
+            ):
+                setattr(cls, parameter, _OperandProperty(i))
+
+        cls._default_tail = tuple(
+            cls._defaults.get(parameter, _no_default) for parameter in cls._parameters
+        )
+        cls._parameter_index = {
+            parameter: i for i, parameter in enumerate(cls._parameters)
+        }
 
-    def __call__(cls, *args, variable_name=None, **kwargs):
-        # Collect optimization rules for new classes
-        if cls not in _ExprMeta.seen:
-            _ExprMeta.seen.add(cls)
-            for rule in cls._replacement_rules():
-                replacement_rules.append(rule)
+        # Blockwise expressions are named after their operation
+        operation = getattr(cls, "operation", None)
+        if operation is not None:
+            cls._prefix = funcname(operation)
+        else:
+            cls._prefix = funcname(cls).lower()
 
+    def __call__(cls, *args, **kwargs):
         # Grab keywords and manage default values
+        if len(args) > len(cls._parameters):
+            raise TypeError(
+                f"{cls.__name__} takes {len(cls._parameters)} arguments "
+                f"but {len(args)} were given"
+            )
         operands = list(args)
-        for parameter in cls._parameters[len(operands) :]:
-            operands.append(kwargs.pop(parameter, cls._defaults[parameter]))
-        assert not kwargs
-
-        # Defer up to matchpy
-        return super().__call__(*operands, variable_name=None)
+        operands.extend(cls._default_tail[len(operands) :])
+        for parameter, value in kwargs.items():
+            index = cls._parameter_index.get(parameter)
+            if index is None:
+                raise TypeError(
+                    f"{cls.__name__} got an unexpected keyword argument {parameter!r}"
+                )
+            if index < len(args):
+                raise TypeError(
+                    f"{cls.__name__} got multiple values for argument {parameter!r}"
+                )
+            operands[index] = value
+        missing = [
+            parameter
+            for parameter, operand in zip(cls._parameters, operands)
+            if operand is _no_default
+        ]
+        if missing:
+            raise TypeError(f"{cls.__name__} missing required arguments {missing}")
+
+        # Operand expressions tokenize by their cached names, so this is cheap
+        name = cls._name_from_operands(operands)
+        expr = _ExprMeta._instances.get((cls, name))
+        if expr is None:
+            expr = super().__call__(*operands)
+            expr._cached_name = name
+            _ExprMeta._instances[cls, name] = expr
+        return expr
+
+
+class _OperandProperty(property):
+    """Property to access the operand at a fixed index"""
+
+    def __init__(self, index):
+        def get(self):
+            return self.operands[index]
+
+        super().__init__(get)
+
+
+def _memoized_meta(func):
+    """Decorator for `_meta` properties that computes them only once
+
+    Metadata is computed from the metadata of our operands, so without this
+    every access would recompute pandas operations down the whole tree.
+    Expressions are immutable and so the result never goes stale.
+    """
 
+    @functools.wraps(func)
+    def get(self):
+        if self._cached_meta is None:
+            self._cached_meta = func(self)
+        return self._cached_meta
 
-_defer_to_matchpy = False
+    return property(get)
 
 
-class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
+class Expr(DaskMethodsMixin, metaclass=_ExprMeta):
     """Primary class for all Expressions
 
     This mostly includes Dask protocols and various Pandas-like method
     definitions to make us look more like a DataFrame.
+
+    Graphs can hold very many expressions, so we keep instances small with
+    `__slots__`.  Subclasses should declare `__slots__ = ()` unless they need
+    an instance `__dict__`, e.g. for `cached_property`.
     """
 
+    __slots__ = (
+        "operands",
+        "_cached_name",
+        "_cached_meta",
+        "_cached_graph",
+        "__weakref__",
+    )
     commutative = False
     associative = False
     _parameters = []
@@ -76,15 +163,36 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
     )
     __dask_optimize__ = staticmethod(lambda dsk, keys, **kwargs: dsk)
 
-    @classmethod
-    def _replacement_rules(cls) -> Iterator[ReplacementRule]:
-        """Rules associated to this class that are useful for optimization
+    def __init__(self, *operands):
+        self.operands = tuple(operands)
+        self._cached_name = None
+        self._cached_meta = None
+        self._cached_graph = None
+
+    def _simplify_down(self):
+        """Rewrite this expression in terms of itself and its operands
+
+        Return a new expression to replace this one, or `self` if there is
+        nothing to do.
+
+        See also:
+            optimize
+            _simplify_up
+        """
+        return self
+
+    def _simplify_up(self, parent):
+        """Rewrite the parent of this expression
+
+        This lets an operand rewrite the expression that consumes it, as in
+        projecting columns down through a binary operation.  Return a new
+        expression to replace `parent`, or `parent` if there is nothing to do.
 
         See also:
             optimize
-            _ExprMeta
+            _simplify_down
         """
-        yield from []
+        return parent
 
     def __str__(self):
         s = ", ".join(
@@ -98,12 +206,13 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
         return str(self)
 
     def __getattr__(self, key):
-        if key == "__name__":
+        if key.startswith("_"):
+            # Private names and protocol probes like `__array__` are never
+            # columns, so don't compute `_meta` just to check
             return object.__getattribute__(self, key)
-        elif key in type(self)._parameters:
-            idx = type(self)._parameters.index(key)
-            return self.operands[idx]
-        elif key in dir(type(self)):
+        elif hasattr(type(self), key):
+            # We only get here if normal lookup failed, e.g. a property that
+            # raised AttributeError.  Re-raise that rather than hide it.
             return object.__getattribute__(self, key)
         elif is_dataframe_like(self._meta) and key in self._meta.columns:
             return self[key]
@@ -111,11 +220,13 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
             return object.__getattribute__(self, key)
 
     def __setattr__(self, key, value):
-        if key in type(self)._parameters:
-            idx = type(self)._parameters.index(key)
-            self.operands[idx] = value
-        else:
-            object.__setattr__(self, key, value)
+        if key in type(self)._parameter_index:
+            # Equal expressions are shared, so changing one would change all
+            raise AttributeError(
+                f"Can't set operand {key!r} of {type(self).__name__}, "
+                "expressions are immutable"
+            )
+        object.__setattr__(self, key, value)
 
     def __getitem__(self, other):
         if isinstance(other, Expr):
@@ -172,16 +283,10 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
         return GE(other, self)
 
     def __eq__(self, other):
-        if _defer_to_matchpy:  # Defer to matchpy when optimizing
-            return Operation.__eq__(self, other)
-        else:
-            return EQ(other, self)
+        return EQ(other, self)
 
     def __ne__(self, other):
-        if _defer_to_matchpy:  # Defer to matchpy when optimizing
-            return Operation.__ne__(self, other)
-        else:
-            return NE(other, self)
+        return NE(other, self)
 
     def sum(self, skipna=True, level=None, numeric_only=None, min_count=0):
         return Sum(self, skipna, level, numeric_only, min_count)
@@ -190,16 +295,16 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
         return self.sum(skipna=skipna) / self.count()
 
     def max(self, skipna=True, level=None, numeric_only=None, min_count=0):
-        return Max(self, skipna, level, numeric_only, min_count)
+        return Max(self, skipna)
 
     def mode(self, dropna=True):
         return Mode(self, dropna=dropna)
 
     def min(self, skipna=True, level=None, numeric_only=None, min_count=0):
-        return Min(self, skipna, level, numeric_only, min_count)
+        return Min(self, skipna)
 
     def count(self, numeric_only=None):
-        return Count(self, numeric_only)
+        return Count(self)
 
     @property
     def size(self):
@@ -213,9 +318,6 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
 
     @property
     def divisions(self):
-        if "divisions" in self._parameters:
-            idx = self._parameters.index("divisions")
-            return self.operands[idx]
         return tuple(self._divisions())
 
     @property
@@ -229,26 +331,21 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
 
     @property
     def npartitions(self):
-        if "npartitions" in self._parameters:
-            idx = self._parameters.index("npartitions")
-            return self.operands[idx]
-        else:
-            return len(self.divisions) - 1
+        return len(self.divisions) - 1
 
     @property
     def _name(self):
-        if "_name" in self._parameters:
-            idx = self._parameters.index("_name")
-            return self.operands[idx]
-        return funcname(type(self)).lower() + "-" + tokenize(*self.operands)
+        if self._cached_name is None:
+            self._cached_name = self._name_from_operands(self.operands)
+        return self._cached_name
+
+    @classmethod
+    def _name_from_operands(cls, operands):
+        return cls._prefix + "-" + tokenize(*operands)
 
     @property
     def columns(self):
-        if "columns" in self._parameters:
-            idx = self._parameters.index("columns")
-            return self.operands[idx]
-        else:
-            return self._meta.columns
+        return self._meta.columns
 
     @property
     def dtypes(self):
@@ -256,32 +353,48 @@ class Expr(Operation, DaskMethodsMixin, metaclass=_ExprMeta):
 
     @property
     def _meta(self):
-        if "_meta" in self._parameters:
-            idx = self._parameters.index("_meta")
-            return self.operands[idx]
         raise NotImplementedError()
 
     def _divisions(self):
         raise NotImplementedError()
 
+    def dependencies(self):
+        """Expressions whose partitions this expression's tasks depend on"""
+        return [operand for operand in self.operands if isinstance(operand, Expr)]
+
     def __dask_graph__(self):
-        """Traverse expression tree, collect layers"""
-        stack = [self]
-        seen = set()
-        layers = []
-        while stack:
-            expr = stack.pop()
+        """Traverse expression tree, collect layers
 
-            if expr._name in seen:
-                continue
-            seen.add(expr._name)
+        Each expression writes its tasks directly into a single graph with
+        `_layer(out)`, rather than building a dict of its own to merge.
+
+        Expressions are immutable, so we keep the result around.  When we
+        later build on top of this expression we copy its graph in and stop
+        traversing there, which makes materialization proportional to the
+        number of new expressions.
+        """
+        if self._cached_graph is None:
+            stack = [self]
+            seen = set()
+            out = {}
+            while stack:
+                expr = stack.pop()
+
+                if id(expr) in seen:
+                    continue
+                seen.add(id(expr))
+
+                if expr._cached_graph is not None:
+                    out.update(expr._cached_graph)
+                    continue
+
+                expr._layer(out)
+                stack.extend(expr.dependencies())
 
-            layers.append(expr._layer())
-            for operand in expr.operands:
-                if isinstance(operand, Expr):
-                    stack.append(operand)
+            self._cached_graph = out
 
-        return toolz.merge(layers)
+        # Callers are free to modify the graph they get back
+        return dict(self._cached_graph)
 
     def __dask_keys__(self):
         return [(self._name, i) for i in range(self.npartitions)]
@@ -301,12 +414,13 @@ class Blockwise(Expr):
     avoid duplication in the future.
     """
 
+    __slots__ = ()
     operation = None
 
-    @property
+    @_memoized_meta
     def _meta(self):
         return self.operation(
-            *[arg._meta if isinstance(arg, Expr) else arg for arg in self.operands]
+            *(arg._meta if isinstance(arg, Expr) else arg for arg in self.operands)
         )
 
     @property
@@ -326,23 +440,22 @@ class Blockwise(Expr):
         )
         return first.divisions
 
-    @property
-    def _name(self):
-        return funcname(self.operation) + "-" + tokenize(*self.operands)
-
-    def _layer(self):
-        return {
-            (self._name, i): (
+    def _layer(self, out):
+        # Resolve operands once, then only fill in the partition index
+        name = self._name
+        operation = self.operation
+        kwargs = self._kwargs
+        operands = [
+            (True, operand._name) if isinstance(operand, Expr) else (False, operand)
+            for operand in self.operands
+        ]
+        for i in range(self.npartitions):
+            out[(name, i)] = (
                 apply,
-                self.operation,
-                [
-                    (operand._name, i) if isinstance(operand, Expr) else operand
-                    for operand in self.operands
-                ],
-                self._kwargs,
+                operation,
+                [(operand, i) if is_expr else operand for is_expr, operand in operands],
+                kwargs,
             )
-            for i in range(self.npartitions)
-        }
 
 
 class Elemwise(Blockwise):
@@ -351,12 +464,13 @@ class Elemwise(Blockwise):
     optimizations, like `len` will care about which operations preserve length
     """
 
-    pass
+    __slots__ = ()
 
 
 class AsType(Elemwise):
     """A good example of writing a trivial blockwise operation"""
 
+    __slots__ = ()
     _parameters = ["frame", "dtypes"]
     operation = M.astype
 
@@ -364,62 +478,63 @@ class AsType(Elemwise):
 class Apply(Elemwise):
     """A good example of writing a less-trivial blockwise operation"""
 
+    __slots__ = ()
     _parameters = ["frame", "function", "args", "kwargs"]
     _defaults = {"args": (), "kwargs": {}}
     operation = M.apply
 
-    @property
+    @_memoized_meta
     def _meta(self):
         return self.frame._meta.apply(self.function, *self.args, **self.kwargs)
 
-    def _layer(self):
-        return {
-            (self._name, i): (
-                apply,
-                M.apply,
-                [(self.frame._name, i), self.function] + list(self.args),
-                self.kwargs,
-            )
-            for i in range(self.npartitions)
-        }
+    def _layer(self, out):
+        # Bind the function and its arguments once, rather than per task
+        name = self._name
+        frame = self.frame._name
+        func = functools.partial(
+            _apply, function=self.function, args=tuple(self.args), kwargs=self.kwargs
+        )
+        for i in range(self.npartitions):
+            out[(name, i)] = (func, (frame, i))
+
+
+def _apply(df, function, args, kwargs):
+    return df.apply(function, *args, **kwargs)
 
 
 class Filter(Blockwise):
+    __slots__ = ()
     _parameters = ["frame", "predicate"]
     operation = operator.getitem
 
-    @classmethod
-    def _replacement_rules(self):
-        df = Wildcard.dot("df")
-        condition = Wildcard.dot("condition")
-        columns = Wildcard.dot("columns")
-
-        # Project columns down through dataframe
-        # df[df.x > 1].y -> df.y[df.x > 1]
-        yield ReplacementRule(
-            Pattern(Filter(df, condition)[columns]),
-            lambda df, condition, columns: df[columns][condition],
-        )
+    def _simplify_up(self, parent):
+        if isinstance(parent, Projection):
+            # Project columns down through dataframe
+            # df[df.x > 1].y -> df.y[df.x > 1]
+            return self.frame[parent.columns][self.predicate]
+        return parent
 
 
 class Projection(Elemwise):
     """Column Selection"""
 
+    __slots__ = ()
     _parameters = ["frame", "columns"]
     operation = operator.getitem
 
     def _divisions(self):
         return self.frame.divisions
 
-    @property
+    @_memoized_meta
     def _meta(self):
         return self.frame._meta[self.columns]
 
-    def _layer(self):
-        return {
-            (self._name, i): (operator.getitem, (self.frame._name, i), self.columns)
-            for i in range(self.npartitions)
-        }
+    def _layer(self, out):
+        name = self._name
+        frame = self.frame._name
+        columns = self.columns
+        for i in range(self.npartitions):
+            out[(name, i)] = (operator.getitem, (frame, i), columns)
 
     def __str__(self):
         base = str(self.frame)
@@ -429,125 +544,224 @@ class Projection(Elemwise):
 
 
 class Binop(Elemwise):
+    __slots__ = ()
     _parameters = ["left", "right"]
-    arity = Arity.binary
-
-    def _layer(self):
-        return {
-            (self._name, i): (
-                self.operation,
-                (self.left._name, i) if isinstance(self.left, Expr) else self.left,
-                (self.right._name, i) if isinstance(self.right, Expr) else self.right,
+
+    def _layer(self, out):
+        # Resolve operands once, then only fill in the partition index
+        name = self._name
+        operation = self.operation
+        left = self.left
+        right = self.right
+        left_is_expr = isinstance(left, Expr)
+        right_is_expr = isinstance(right, Expr)
+        if left_is_expr:
+            left = left._name
+        if right_is_expr:
+            right = right._name
+        for i in range(self.npartitions):
+            out[(name, i)] = (
+                operation,
+                (left, i) if left_is_expr else left,
+                (right, i) if right_is_expr else right,
             )
-            for i in range(self.npartitions)
-        }
 
     def __str__(self):
         return f"{self.left} {self._operator_repr} {self.right}"
 
-    @classmethod
-    def _replacement_rules(cls):
-        left = Wildcard.dot("left")
-        right = Wildcard.dot("right")
-        columns = Wildcard.dot("columns")
-
-        # Column Projection
-        def transform(left, right, columns, cls=None):
+    def _simplify_up(self, parent):
+        if isinstance(parent, Projection):
+            # Column Projection
+            # (a + b)[c] -> a[c] + b[c]
+            left = self.left
+            right = self.right
             if isinstance(left, Expr):
-                left = left[columns]  # TODO: filter just the correct columns
+                left = left[parent.columns]  # TODO: filter just the correct columns
 
             if isinstance(right, Expr):
-                right = right[columns]
+                right = right[parent.columns]
 
-            return cls(left, right)
+            return type(self)(left, right)
+        return parent
 
-        # (a + b)[c] -> a[c] + b[c]
-        yield ReplacementRule(
-            Pattern(cls(left, right)[columns]), functools.partial(transform, cls=cls)
-        )
+    def _simplify_down(self):
+        if self.associative and self.commutative:
+            return self._fold_constants()
+        return self
+
+    def _fold_constants(self):
+        """Combine all integer constants in a chain of this operation
+
+        The constants need not be adjacent in the tree, so we flatten the
+        whole chain first.  For example ``((x * 2) * y) * 3 -> 6 * (x * y)``
+
+        Regrouping is only exact for wrapping int64 arithmetic.  Floats round
+        differently, and narrower integers change dtype depending on the
+        values involved, so we leave any other chain alone.
+        """
+        nodes = []
+        leaves = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is type(self):
+                nodes.append(node)
+                stack.append(node.right)
+                stack.append(node.left)
+            else:
+                leaves.append(node)
+
+        constants = [leaf for leaf in leaves if type(leaf) is int]
+        others = [leaf for leaf in leaves if type(leaf) is not int]
+        if len(constants) < 2 or not others:
+            return self
+
+        folded = functools.reduce(self.operation, constants)
+        if not all(_fits_int64(c) for c in constants + [folded]):
+            return self
+        try:
+            metas = [node._meta for node in nodes + others if isinstance(node, Expr)]
+        except Exception:
+            # Without metadata we can't tell that folding is safe, but that
+            # is no reason for optimization to fail
+            return self
+        if not all(_is_int64(meta) for meta in metas):
+            return self
+
+        return type(self)(folded, functools.reduce(type(self), others))
+
+
+def _fits_int64(value):
+    return -(2**63) <= value < 2**63
+
+
+def _is_int64(meta):
+    """Whether all data in `meta` are signed 64-bit integers"""
+    if is_dataframe_like(meta):
+        dtypes = meta.dtypes
+    else:
+        dtypes = [getattr(meta, "dtype", None)]
+    return all(
+        getattr(dtype, "kind", None) == "i" and dtype.itemsize == 8 for dtype in dtypes
+    )
 
 
 class Add(Binop):
+    __slots__ = ()
+    associative = True
+    commutative = True
     operation = operator.add
     _operator_repr = "+"
 
-    @classmethod
-    def _replacement_rules(cls):
-        x = Wildcard.dot("x")
-        yield ReplacementRule(
-            Pattern(Add(x, x)),
-            lambda x: Mul(2, x),
-        )
-
-        yield from super()._replacement_rules()
+    def _simplify_down(self):
+        # x + x -> 2 * x
+        # Expressions are hash-consed, so equal operands are the same object
+        if isinstance(self.left, Expr) and self.left is self.right:
+            return Mul(2, self.left)
+        return super()._simplify_down()
 
 
 class Sub(Binop):
+    __slots__ = ()
     operation = operator.sub
     _operator_repr = "-"
 
 
 class Mul(Binop):
+    __slots__ = ()
+    associative = True
+    commutative = True
     operation = operator.mul
     _operator_repr = "*"
 
-    @classmethod
-    def _replacement_rules(cls):
-        a, b, c = map(Wildcard.dot, "abc")
-        yield ReplacementRule(
-            Pattern(
-                Mul(a, Mul(b, c)),
-                CustomConstraint(
-                    lambda a, b, c: isinstance(a, numbers.Number)
-                    and isinstance(b, numbers.Number)
-                ),
-            ),
-            lambda a, b, c: Mul(a * b, c),
-        )
-
-        yield from super()._replacement_rules()
-
 
 class Div(Binop):
+    __slots__ = ()
     operation = operator.truediv
     _operator_repr = "/"
 
 
 class LT(Binop):
+    __slots__ = ()
     operation = operator.lt
     _operator_repr = "<"
 
 
 class LE(Binop):
+    __slots__ = ()
     operation = operator.le
     _operator_repr = "<="
 
 
 class GT(Binop):
+    __slots__ = ()
     operation = operator.gt
     _operator_repr = ">"
 
 
 class GE(Binop):
+    __slots__ = ()
     operation = operator.ge
     _operator_repr = ">="
 
 
 class EQ(Binop):
+    __slots__ = ()
     operation = operator.eq
     _operator_repr = "=="
 
 
 class NE(Binop):
+    __slots__ = ()
     operation = operator.ne
     _operator_repr = "!="
 
 
+class FusedBlockwise(Expr):
+    """A group of blockwise expressions computed as one task per partition
+
+    `exprs` holds the fused expressions with the output last, and `inputs`
+    holds the expressions outside of the group that they read from.  Each
+    output task nests the tasks of the whole group, so the scheduler sees
+    one task per partition instead of one per expression.
+
+    See also:
+        optimize_blockwise_fusion
+    """
+
+    __slots__ = ()
+    _parameters = ["exprs", "inputs"]
+
+    @property
+    def _meta(self):
+        return self.exprs[-1]._meta
+
+    def _divisions(self):
+        return self.exprs[-1].divisions
+
+    def dependencies(self):
+        return list(self.inputs)
+
+    def _layer(self, out):
+        internal = {}
+        for expr in self.exprs:
+            expr._layer(internal)
+
+        name = self._name
+        output = self.exprs[-1]._name
+        for i in range(self.npartitions):
+            out[(name, i)] = _inline_tasks(internal[(output, i)], internal)
+
+    def __str__(self):
+        return f"Fused({self.exprs[-1]})"
+
+
 class IO(Expr):
-    pass
+    __slots__ = ()
 
 
 class ReadCSV(IO):
+    __slots__ = ()
     _parameters = ["filename", "usecols", "header"]
     _defaults = {"usecols": None, "header": None}
 
@@ -555,23 +769,23 @@ class ReadCSV(IO):
 class from_pandas(IO):
     """The only way today to get a real dataframe"""
 
+    __slots__ = ()
     _parameters = ["frame", "npartitions"]
     _defaults = {"npartitions": 1}
 
-    @property
+    @_memoized_meta
     def _meta(self):
         return self.frame.head(0)
 
     def _divisions(self):
         return [None] * (self.npartitions + 1)
 
-    def _layer(self):
-        chunksize = int(math.ceil(len(self.frame) / self.npartitions))
-        locations = list(range(0, len(self.frame), chunksize)) + [len(self.frame)]
-        return {
-            (self._name, i): self.frame.iloc[start:stop]
-            for i, (start, stop) in enumerate(zip(locations[:-1], locations[1:]))
-        }
+    def _layer(self, out):
+        frame = self.frame
+        name = self._name
+        locations = np.linspace(0, len(frame), self.npartitions + 1, dtype=np.int64)
+        for i, (start, stop) in enumerate(zip(locations[:-1], locations[1:])):
+            out[(name, i)] = frame.iloc[start:stop]
 
     def __str__(self):
         return "df"
@@ -586,10 +800,15 @@ class from_graph(IO):
     conversion from legacy dataframes.
     """
 
+    __slots__ = ()
     _parameters = ["layer", "_meta", "divisions", "_name"]
 
-    def _layer(self):
-        return self.layer
+    @classmethod
+    def _name_from_operands(cls, operands):
+        return operands[cls._parameters.index("_name")]
+
+    def _layer(self, out):
+        out.update(self.layer)
 
 
 @normalize_token.register(Expr)
@@ -597,32 +816,140 @@ def normalize_expression(expr):
     return expr._name
 
 
-def optimize(expr):
+def _simplify(expr):
+    """Rewrite an expression tree once, from the leaves up
+
+    We simplify all operands first, then give the expression a chance to
+    rewrite itself with `_simplify_down`, and then give each of its operands
+    a chance to rewrite it with `_simplify_up`.  We stop at the first rewrite
+    and leave any further work to the next pass.
+    """
+    operands = [
+        _simplify(operand) if isinstance(operand, Expr) else operand
+        for operand in expr.operands
+    ]
+    if any(new is not old for new, old in zip(operands, expr.operands)):
+        expr = type(expr)(*operands)
+
+    out = expr._simplify_down()
+    if out is not expr:
+        return out
+
+    for operand in expr.operands:
+        if isinstance(operand, Expr):
+            out = operand._simplify_up(expr)
+            if out is not expr:
+                return out
+
+    return expr
+
+
+def optimize(expr, fuse=False):
     """High level query optimization
 
-    Today we just use MatchPy's term rewriting system, leveraging the
-    replacement rules found in the `replacement_rules` global list .  We continue
-    rewriting until nothing changes.  The `replacement_rules` list can be added
-    to by anyone, but is mostly populated by the various `_replacement_rules`
-    methods on the Expr subclasses.
-
-    Note: matchpy expects `__eq__` and `__ne__` to work in a certain way during
-    matching.  This is a bit of a hack, but we turn off our implementations of
-    `__eq__` and `__ne__` when this function is running using the
-    `_defer_to_matchpy` global.  Please forgive us our sins, as we forgive
-    those who sin against us.
+    Each expression class defines local rewrites in `_simplify_down` (an
+    expression rewrites itself) and `_simplify_up` (an operand rewrites its
+    parent).  We walk the tree applying these rewrites until nothing changes.
+
+    Because expressions are hash-consed, a pass that changes nothing hands
+    back the very same object, and so we check for convergence with `is`
+    rather than by comparing names or string representations.
+
+    If ``fuse=True`` we then also fuse chains of blockwise expressions into
+    single tasks with `optimize_blockwise_fusion`.
+
+    See also:
+        Expr._simplify_down
+        Expr._simplify_up
     """
-    last = None
-    global _defer_to_matchpy
-
-    _defer_to_matchpy = True  # take over ==/!= when optimizing
-    try:
-        while str(expr) != str(last):
-            last = expr
-            expr = replace_all(expr, replacement_rules)
-    finally:
-        _defer_to_matchpy = False
+    while True:
+        new = _simplify(expr)
+        if new is expr:
+            break
+        expr = new
+
+    if fuse:
+        expr = optimize_blockwise_fusion(expr)
     return expr
 
 
+def optimize_blockwise_fusion(expr):
+    """Fuse groups of blockwise expressions into single tasks
+
+    A blockwise expression that feeds exactly one other blockwise expression
+    is computed within its consumer's task rather than in a task of its own.
+    Expressions with several consumers stay separate, so that we never
+    compute anything twice.
+
+    See also:
+        FusedBlockwise
+        optimize
+    """
+    # Count how many times each expression is used as an input
+    dependents = {}
+    stack = [expr]
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        for dependency in node.dependencies():
+            dependents[id(dependency)] = dependents.get(id(dependency), 0) + 1
+            stack.append(dependency)
+
+    def fusable(node):
+        return isinstance(node, Blockwise) and dependents[id(node)] == 1
+
+    def rebuild(node, group):
+        # Rebuild node on top of rewritten operands.  Within a group we
+        # descend into fusable operands and collect them, leaves first.
+        operands = []
+        for operand in node.operands:
+            if isinstance(operand, Expr):
+                if group is not None and fusable(operand):
+                    operand = rebuild(operand, group)
+                else:
+                    operand = fuse(operand)
+            operands.append(operand)
+        node = type(node)(*operands)
+        if group is not None:
+            group.append(node)
+        return node
+
+    fused = {}
+
+    def fuse(node):
+        if id(node) not in fused:
+            if isinstance(node, Blockwise):
+                group = []
+                result = rebuild(node, group)
+                if len(group) > 1:
+                    members = {id(member) for member in group}
+                    inputs = {}
+                    for member in group:
+                        for dependency in member.dependencies():
+                            if id(dependency) not in members:
+                                inputs[id(dependency)] = dependency
+                    result = FusedBlockwise(tuple(group), tuple(inputs.values()))
+            else:
+                result = rebuild(node, None)
+            fused[id(node)] = result
+        return fused[id(node)]
+
+    return fuse(expr)
+
+
+def _inline_tasks(task, dsk):
+    """Replace references to keys in ``dsk`` with their tasks, recursively"""
+    if ishashable(task) and task in dsk:
+        return _inline_tasks(dsk[task], dsk)
+    elif type(task) is tuple:
+        return tuple(_inline_tasks(arg, dsk) for arg in task)
+    elif type(task) is list:
+        return [_inline_tasks(arg, dsk) for arg in task]
+    else:
+        return task
+
+
 from dask_match.reductions import Count, Max, Min, Mode, Size, Sum
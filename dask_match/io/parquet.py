@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from functools import cached_property, partial
+import operator
+from functools import cached_property
 
 import dask
+from dask.base import tokenize
 from dask.dataframe.io.parquet.core import (
     ParquetFunctionWrapper,
     get_engine,
@@ -12,16 +14,42 @@ from dask.dataframe.io.parquet.core import (
 from dask.dataframe.io.parquet.utils import _split_user_options
 from dask.utils import natural_sort_key
 from fsspec.utils import stringify_path
-from matchpy import CustomConstraint, Pattern, ReplacementRule, Wildcard
 
-from dask_match.core import EQ, GE, GT, IO, LE, LT, NE, Filter
+from dask_match.core import (
+    EQ,
+    GE,
+    GT,
+    IO,
+    LE,
+    LT,
+    NE,
+    Expr,
+    Filter,
+    Projection,
+    _ExprMeta,
+)
 
 NONE_LABEL = "__null_dask_index__"
 
+# Filesystem and paths of each dataset, shared between ReadParquet expressions
+_fs_info_cache = {}
+_fs_info_cache_size = 32
+
+# Comparison to use when we swap its two sides, as in `1 < x` -> `x > 1`
+_flipped_operators = {
+    "<": ">",
+    "<=": ">=",
+    ">": "<",
+    ">=": "<=",
+    "==": "==",
+    "!=": "!=",
+}
+
 
 class ReadParquet(IO):
     """Read a parquet dataset"""
 
+    # No __slots__ here, cached_property needs an instance __dict__
     _parameters = [
         "path",
         "columns",
@@ -62,110 +90,134 @@ class ReadParquet(IO):
     def engine(self):
         return get_engine("pyarrow")
 
-    @classmethod
-    def _replacement_rules(cls):
-        _ = Wildcard.dot()
-        a, b, c, d, e, f = map(Wildcard.dot, "abcdef")
+    def _simplify_up(self, parent):
+        if isinstance(parent, Projection):
+            # Column projection
+            return self._with_operand("columns", parent.columns)
+
+        if isinstance(parent, Filter) and isinstance(
+            parent.predicate, (LE, LT, GE, GT, EQ, NE)
+        ):
+            # Predicate pushdown to parquet
+            # df[df.x > 1] -> ReadParquet(..., filters=[("x", ">", 1)])
+            # df[1 < df.x] -> ReadParquet(..., filters=[("x", ">", 1)])
+            op = parent.predicate
+            for side, value, op_repr in [
+                (op.left, op.right, op._operator_repr),
+                (op.right, op.left, _flipped_operators[op._operator_repr]),
+            ]:
+                if isinstance(value, Expr):
+                    continue
+                column = self._predicate_column(side)
+                if column is not None:
+                    filters = (self.filters or []) + [(column, op_repr, value)]
+                    return self._with_operand("filters", filters)
+
+        return parent
+
+    def _predicate_column(self, expr):
+        """Column name if `expr` selects a single column from our dataset"""
+        if (
+            isinstance(expr, Projection)
+            and isinstance(expr.frame, ReadParquet)
+            and expr.frame.path == self.path
+        ):
+            return expr.columns
+        if (
+            isinstance(expr, ReadParquet)
+            and expr.path == self.path
+            and isinstance(expr.columns, str)
+        ):
+            return expr.columns
+        return None
+
+    def _with_operand(self, parameter, value):
+        """A copy of this expression with one operand replaced"""
+        operands = list(self.operands)
+        operands[self._parameters.index(parameter)] = value
+        return ReadParquet(*operands)
+
+    @cached_property
+    def _dataset_info(self):
+        dataset_info = self._collect_dataset_info()
 
-        # Column projection
-        yield ReplacementRule(
-            Pattern(ReadParquet(a, columns=b, filters=c)[d]),
-            lambda a, b, c, d: ReadParquet(a, columns=d, filters=c),
+        # Infer meta, accounting for index and columns arguments.
+        auto_index_allowed = self.index is None
+        index = [self.index] if isinstance(self.index, str) else self.index
+        meta = self.engine._create_dd_meta(dataset_info, self.use_nullable_dtypes)
+        columns = [self.columns] if isinstance(self.columns, str) else self.columns
+        meta, index, columns = set_index_columns(
+            meta, index, columns, auto_index_allowed
         )
+        if meta.index.name == NONE_LABEL:
+            meta.index.name = None
+        dataset_info["meta"] = meta
+        dataset_info["index"] = index
+        dataset_info["columns"] = columns
 
-        # Predicate pushdown to parquet
-        for op in [LE, LT, GE, GT, EQ, NE]:
-
-            def predicate_pushdown(a, b, c, d, e, op=None):
-                return ReadParquet(
-                    a, columns=b, filters=(c or []) + [(op._operator_repr, d, e)]
-                )
-
-            yield ReplacementRule(
-                Pattern(
-                    Filter(
-                        ReadParquet(a, columns=b, filters=c),
-                        op(ReadParquet(a, columns=_, filters=_)[d], e),
-                    )
-                ),
-                partial(predicate_pushdown, op=op),
-            )
+        return dataset_info
 
-            def predicate_pushdown(a, b, c, d, e, op=None):
-                return ReadParquet(
-                    a, columns=b, filters=(c or []) + [(op._operator_repr, e, d)]
-                )
-
-            yield ReplacementRule(
-                Pattern(
-                    Filter(
-                        ReadParquet(a, columns=b, filters=c),
-                        op(e, ReadParquet(a, columns=_, filters=_)[d]),
-                    )
-                ),
-                partial(predicate_pushdown, op=op),
-            )
+    def _fs_info(self):
+        """Filesystem and paths of our dataset, along with the user options
+
+        Finding these can mean walking a remote filesystem, and doesn't depend
+        on the columns or filters, so we share the result between expressions
+        that differ only in those, like the ones produced by column projection
+        and predicate pushdown.  See `clear_cache` if the files change.
+        """
+        token = tokenize(self.path, self.filesystem, self.storage_options, self.kwargs)
+        if token not in _fs_info_cache:
+            # Process and split user options
+            (
+                dataset_options,
+                read_options,
+                open_file_options,
+                other_options,
+            ) = _split_user_options(**self.kwargs)
 
-            def predicate_pushdown(a, b, c, d, e, op=None):
-                return ReadParquet(
-                    a, columns=b, filters=(c or []) + [(op._operator_repr, d, e)]
-                )
-
-            yield ReplacementRule(
-                Pattern(
-                    Filter(
-                        ReadParquet(a, columns=b, filters=c),
-                        op(ReadParquet(a, columns=d, filters=_), e),
-                    ),
-                    CustomConstraint(lambda d: isinstance(d, str)),
-                ),
-                partial(predicate_pushdown, op=op),
+            # Extract global filesystem and paths
+            (
+                fs,
+                paths,
+                dataset_options,
+                open_file_options,
+            ) = self.engine.extract_filesystem(
+                self.path,
+                self.filesystem,
+                dataset_options,
+                open_file_options,
+                self.storage_options,
             )
-
-            def predicate_pushdown(a, b, c, d, e, op=None):
-                return ReadParquet(
-                    a, columns=b, filters=(c or []) + [(op._operator_repr, e, d)]
-                )
-
-            yield ReplacementRule(
-                Pattern(
-                    Filter(
-                        ReadParquet(a, columns=b, filters=c),
-                        op(e, ReadParquet(a, columns=d, filters=_)),
-                    ),
-                    CustomConstraint(lambda d: isinstance(d, str)),
-                ),
-                partial(predicate_pushdown, op=op),
+            read_options["open_file_options"] = open_file_options
+            # numeric rather than glob ordering
+            paths = sorted(paths, key=natural_sort_key)
+
+            if len(_fs_info_cache) >= _fs_info_cache_size:
+                del _fs_info_cache[next(iter(_fs_info_cache))]
+            _fs_info_cache[token] = (
+                fs,
+                paths,
+                dataset_options,
+                read_options,
+                other_options,
             )
 
-    @cached_property
-    def _dataset_info(self):
-
-        # Process and split user options
-        (
-            dataset_options,
-            read_options,
-            open_file_options,
-            other_options,
-        ) = _split_user_options(**self.kwargs)
-
-        # Extract global filesystem and paths
-        fs, paths, dataset_options, open_file_options = self.engine.extract_filesystem(
-            self.path,
-            self.filesystem,
-            dataset_options,
-            open_file_options,
-            self.storage_options,
+        fs, paths, dataset_options, read_options, other_options = _fs_info_cache[token]
+        # The engine may modify the options, so hand out copies
+        return (
+            fs,
+            list(paths),
+            dict(dataset_options),
+            dict(read_options),
+            dict(other_options),
         )
-        read_options["open_file_options"] = open_file_options
-        paths = sorted(paths, key=natural_sort_key)  # numeric rather than glob ordering
 
-        auto_index_allowed = False
-        if self.index is None:
-            # User is allowing auto-detected index
-            auto_index_allowed = True
-        if self.index and isinstance(self.index, str):
-            self.index = [self.index]
+    def _collect_dataset_info(self):
+        fs, paths, dataset_options, read_options, other_options = self._fs_info()
+
+        index = self.index
+        if index and isinstance(index, str):
+            index = [index]
 
         if self.split_row_groups in ("infer", "adaptive"):
             # Using blocksize to plan partitioning
@@ -182,7 +234,7 @@ class ReadParquet(IO):
             paths,
             fs,
             self.categories,
-            self.index,
+            index,
             self.calculate_divisions,
             self.filters,
             self.split_row_groups,
@@ -197,24 +249,15 @@ class ReadParquet(IO):
                 **other_options,
             },
         )
-
-        # Infer meta, accounting for index and columns arguments.
-        meta = self.engine._create_dd_meta(dataset_info, self.use_nullable_dtypes)
-        self.index = [self.index] if isinstance(self.index, str) else self.index
-        meta, index, columns = set_index_columns(
-            meta, self.index, self.columns, auto_index_allowed
-        )
-        if meta.index.name == NONE_LABEL:
-            meta.index.name = None
-        dataset_info["meta"] = meta
-        dataset_info["index"] = index
-        dataset_info["columns"] = columns
-
         return dataset_info
 
     @property
     def _meta(self):
-        return self._dataset_info["meta"]
+        meta = self._dataset_info["meta"]
+        if isinstance(self.columns, str):
+            # A single column name selects a Series, as in `df["x"]`
+            return meta[self.columns]
+        return meta
 
     @cached_property
     def _plan(self):
@@ -267,10 +310,28 @@ class ReadParquet(IO):
     def _divisions(self):
         return self._plan["divisions"]
 
-    def _layer(self):
-        io_func = self._plan["func"]
-        parts = self._plan["parts"]
-        return {(self._name, i): (io_func, part) for i, part in enumerate(parts)}
+    def _layer(self, out):
+        # Every task shares the same io_func, only the part differs
+        name = self._name
+        plan = self._plan
+        io_func = plan["func"]
+        if isinstance(self.columns, str):
+            for i, part in enumerate(plan["parts"]):
+                out[(name, i)] = (operator.getitem, (io_func, part), self.columns)
+        else:
+            for i, part in enumerate(plan["parts"]):
+                out[(name, i)] = (io_func, part)
+
+
+def clear_cache():
+    """Forget the filesystems and paths found for parquet datasets
+
+    Call this after changing the files of a dataset that has been read
+    before.  We also forget the expressions we share between equal calls,
+    so that new expressions don't reuse the metadata of old ones.
+    """
+    _fs_info_cache.clear()
+    _ExprMeta._instances.clear()
 
 
 def read_parquet(
@@ -2,9 +2,8 @@ import pandas as pd
 import toolz
 from dask.dataframe.core import _concat, is_series_like
 from dask.utils import M, apply
-from matchpy import Pattern, ReplacementRule, Wildcard
 
-from dask_match.core import Expr
+from dask_match.core import Expr, Projection, _memoized_meta
 
 
 class ApplyConcatApply(Expr):
@@ -25,6 +24,7 @@ class ApplyConcatApply(Expr):
     combine takes from aggregate and aggregate takes from chunk.
     """
 
+    __slots__ = ()
     _parameters = ["frame"]
     chunk = None
     combine = None
@@ -37,7 +37,7 @@ class ApplyConcatApply(Expr):
     def __dask_postcompute__(self):
         return toolz.first, ()
 
-    def _layer(self):
+    def _layer(self, out):
         # Normalize functions in case not all are defined
         chunk = self.chunk
         chunk_kwargs = self.chunk_kwargs
@@ -56,17 +56,16 @@ class ApplyConcatApply(Expr):
             combine = aggregate
             combine_kwargs = aggregate_kwargs
 
-        d = {}
         keys = self.frame.__dask_keys__()
 
         # apply chunk to every input partition
         for i, key in enumerate(keys):
             if chunk_kwargs:
-                d[self._name, 0, i] = (apply, chunk, [key], chunk_kwargs)
+                out[self._name, 0, i] = (apply, chunk, [key], chunk_kwargs)
             else:
-                d[self._name, 0, i] = (chunk, key)
+                out[self._name, 0, i] = (chunk, key)
 
-        keys = list(d)
+        keys = [(self._name, 0, i) for i in range(len(keys))]
         j = 1
 
         # apply combine to batches of intermediate results
@@ -77,19 +76,22 @@ class ApplyConcatApply(Expr):
             ):
                 batch = list(batch)
                 if combine_kwargs:
-                    d[self._name, j, i] = (apply, combine, [batch], self.combine_kwargs)
+                    out[self._name, j, i] = (
+                        apply,
+                        combine,
+                        [batch],
+                        self.combine_kwargs,
+                    )
                 else:
-                    d[self._name, j, i] = (combine, batch)
+                    out[self._name, j, i] = (combine, batch)
                 new_keys.append((self._name, j, i))
             j += 1
             keys = new_keys
 
         # apply aggregate to the final result
-        d[self._name, 0] = (apply, aggregate, [keys], aggregate_kwargs)
+        out[self._name, 0] = (apply, aggregate, [keys], aggregate_kwargs)
 
-        return d
-
-    @property
+    @_memoized_meta
     def _meta(self):
         meta = self.frame._meta
         meta = self.chunk(meta, **self.chunk_kwargs)
@@ -116,6 +118,7 @@ class Reduction(ApplyConcatApply):
     methods.
     """
 
+    __slots__ = ()
     _defaults = {
         "skipna": True,
         "level": None,
@@ -165,6 +168,7 @@ class Reduction(ApplyConcatApply):
 
 
 class Sum(Reduction):
+    __slots__ = ()
     _parameters = ["frame", "skipna", "level", "numeric_only", "min_count"]
     reduction_chunk = M.sum
 
@@ -177,20 +181,18 @@ class Sum(Reduction):
             min_count=self.min_count,
         )
 
-    @property
+    @_memoized_meta
     def _meta(self):
         return self.frame._meta.sum(**self.chunk_kwargs)
 
-    @classmethod
-    def _replacement_rules(cls):
-        a, b, c, d, e, f = map(Wildcard.dot, "abcdef")
-        yield ReplacementRule(
-            Pattern(Sum(a, b, c, d, e)[f]),
-            lambda a, b, c, d, e, f: Sum(a[f], b, c, d, e),
-        )
+    def _simplify_up(self, parent):
+        if isinstance(parent, Projection):
+            return Sum(self.frame[parent.columns], *self.operands[1:])
+        return parent
 
 
 class Max(Reduction):
+    __slots__ = ()
     _parameters = ["frame", "skipna"]
     reduction_chunk = M.max
 
@@ -200,28 +202,25 @@ class Max(Reduction):
             skipna=self.skipna,
         )
 
-    @property
+    @_memoized_meta
     def _meta(self):
         return self.frame._meta.max(**self.chunk_kwargs)
 
-    @classmethod
-    def _replacement_rules(cls):
-        df = Wildcard.dot("df")
-        skipna = Wildcard.dot("skipna")
-        columns = Wildcard.dot("columns")
-
-        yield ReplacementRule(
-            Pattern(Max(df, skipna=skipna)[columns]),
-            lambda df, skipna, columns: df[columns].max(skipna=skipna),
-        )
+    def _simplify_up(self, parent):
+        if isinstance(parent, Projection):
+            # Also used by Min
+            return type(self)(self.frame[parent.columns], *self.operands[1:])
+        return parent
 
 
 class Size(Reduction):
+    __slots__ = ()
     reduction_chunk = staticmethod(lambda df: df.size)
     reduction_aggregate = sum
 
 
 class Count(Reduction):
+    __slots__ = ()
     _parameters = ["frame"]
     split_every = 16
     reduction_chunk = M.count
@@ -232,6 +231,7 @@ class Count(Reduction):
 
 
 class Min(Max):
+    __slots__ = ()
     reduction_chunk = M.min
 
 
@@ -242,6 +242,7 @@ class Mode(ApplyConcatApply):
     to ApplyConcatApply
     """
 
+    __slots__ = ()
     _parameters = ["frame", "dropna"]
     _defaults = {"dropna": True}
     chunk = M.value_counts
@@ -5,7 +5,7 @@ import pytest
 from dask.dataframe.utils import assert_eq
 from dask.utils import M
 
-from dask_match import ReadCSV, from_pandas, optimize, read_parquet
+from dask_match import Add, ReadCSV, from_pandas, optimize, read_parquet
 
 
 def test_basic():
@@ -33,15 +33,20 @@ df_bc = read_parquet("myfile.parquet", columns=["b", "c"])
             df + df,
             2 * df,
         ),
+        (
+            # Add -> Mul, with separately constructed operands
+            read_parquet("myfile.parquet", columns=["a", "b", "c"]) + df,
+            2 * df,
+        ),
         (
             # Column projection
             df[["b", "c"]],
             read_parquet("myfile.parquet", columns=["b", "c"]),
         ),
         (
-            # Compound
+            # Compound, constants stay put as the file has no metadata
             3 * (df + df)[["b", "c"]],
-            6 * df_bc,
+            3 * (2 * df_bc),
         ),
         (
             # Traverse Sum
@@ -65,6 +70,49 @@ def test_optimize(input, expected):
     assert str(result) == str(expected)
 
 
+@pytest.mark.parametrize(
+    "input,expected",
+    [
+        (
+            # Fold constants along a chain
+            lambda df: (((df * 2) * 3) * 4) * 5,
+            lambda df: 120 * df,
+        ),
+        (
+            # Fold constants that aren't adjacent
+            lambda df: ((df.x + 1) + df.y) + 2,
+            lambda df: 3 + (df.x + df.y),
+        ),
+        (
+            # Compound
+            lambda df: 3 * (df + df)[["x", "y"]],
+            lambda df: 6 * df[["x", "y"]],
+        ),
+    ],
+)
+def test_fold_constants(input, expected):
+    df = from_pandas(pd.DataFrame({"x": range(10), "y": range(10)}), npartitions=2)
+    assert str(optimize(input(df))) == str(expected(df))
+
+
+def test_fold_constants_exact():
+    # Floats round differently once regrouped
+    df = pd.DataFrame({"x": [1.0, 2.0]})
+    ddf = from_pandas(df, npartitions=1)
+    expr = (ddf.x + 1e16) + -1e16
+    assert optimize(expr) is expr
+    expr = (ddf.x + 10**16) + -(10**16)
+    assert optimize(expr) is expr
+    assert_eq(optimize(expr).compute(), (df.x + 10**16) + -(10**16))
+
+    # Narrow integers overflow and change dtype depending on the values
+    df = pd.DataFrame({"x": [1, 2]}, dtype="int8")
+    ddf = from_pandas(df, npartitions=1)
+    expr = (ddf.x * 100) * 100
+    assert optimize(expr) is expr
+    assert_eq(optimize(expr).compute(), (df.x * 100) * 100)
+
+
 def test_meta_divisions_name():
     a = pd.DataFrame({"x": [1, 2, 3, 4], "y": [1.0, 2.0, 3.0, 4.0]})
     df = 2 * from_pandas(a, npartitions=2)
@@ -170,9 +218,11 @@ def test_predicate_pushdown(tmpdir):
     x = df[df.a == 5][df.c > 20]["b"]
     y = optimize(x)
     assert isinstance(y, ReadParquet)
-    assert ("==", "a", 5) in y.filters or ("==", 5, "a") in y.filters
-    assert (">", "c", 20) in y.filters
+    assert ("a", "==", 5) in y.filters
+    assert ("c", ">", 20) in y.filters
     assert y.columns == "b"
+    expected = original[(original.a == 5) & (original.c > 20)]["b"]
+    assert_eq(y.compute(), expected.reset_index(drop=True))
 
 
 @pytest.mark.parametrize(
@@ -191,6 +241,16 @@ def test_blockwise(func):
     assert_eq(func(df), func(ddf))
 
 
+def test_astype_dtypes():
+    df = pd.DataFrame({"x": range(4), "y": range(4)})
+    ddf = from_pandas(df, npartitions=2)
+
+    # The `dtypes` operand doesn't hide the dtypes of the result
+    result = ddf.astype({"x": float})
+    assert result.dtypes.equals(result._meta.dtypes)
+    assert result.dtypes.equals(df.astype({"x": float}).dtypes)
+
+
 def test_repr():
     df = pd.DataFrame({"x": range(20), "y": range(20)})
     df = from_pandas(df, npartitions=1)
@@ -230,3 +290,141 @@ def test_persist():
     assert len(b.__dask_graph__()) == b.npartitions
 
     assert_eq(b.y.sum(), (df + 2).y.sum())
+
+
+def test_structural_sharing():
+    df = pd.DataFrame({"x": range(20), "y": range(20)})
+    ddf = from_pandas(df, npartitions=2)
+
+    assert ddf + 1 is ddf + 1
+    assert (ddf.x + ddf.y).sum() is (ddf.x + ddf.y).sum()
+    assert ddf + 1 is not ddf + 2
+
+    with pytest.raises(AttributeError, match="immutable"):
+        (ddf + 1).right = 2
+    assert (ddf + 1).right == 1
+
+
+def test_construction_errors():
+    df = from_pandas(pd.DataFrame({"x": range(4)}), npartitions=2)
+
+    with pytest.raises(TypeError, match="missing"):
+        Add(df)
+    with pytest.raises(TypeError, match="unexpected"):
+        Add(df, 1, foo=2)
+    with pytest.raises(TypeError, match="multiple values"):
+        Add(df, 1, left=2)
+    with pytest.raises(TypeError, match="takes 2 arguments"):
+        Add(df, 1, 2)
+
+
+def test_from_pandas_partitions():
+    df = pd.DataFrame({"x": range(4)})
+    ddf = from_pandas(df, npartitions=3)
+
+    graph = ddf.__dask_graph__()
+    assert len(graph) == ddf.npartitions == 3
+    assert all(len(part) > 0 for part in graph.values())
+    assert_eq(ddf.compute(), df)
+
+
+def test_graph_cache():
+    df = pd.DataFrame({"x": range(20), "y": range(20)})
+    ddf = from_pandas(df, npartitions=2)
+
+    x = ddf.x + 1
+    graph = x.__dask_graph__()
+    graph.clear()
+    assert len(x.__dask_graph__()) == 3 * ddf.npartitions
+
+    y = x.sum()
+    assert set(x.__dask_graph__()).issubset(y.__dask_graph__())
+    assert y.compute() == (df.x + 1).sum()
+
+
+def test_parquet_column_projection(tmpdir):
+    fn = os.path.join(str(tmpdir), "myfile.parquet")
+    original = pd.DataFrame({"a": range(10), "b": range(10), "c": range(10)})
+    original.to_parquet(fn)
+
+    df = read_parquet(fn)
+    assert list(df._meta.columns) == ["a", "b", "c"]
+
+    # Projected variants share dataset discovery but not column selection
+    result = optimize(df[["a", "c"]])
+    assert list(result.columns) == ["a", "c"]
+    assert list(result._meta.columns) == ["a", "c"]
+    assert_eq(result.compute(), original[["a", "c"]])
+
+
+def test_parquet_clear_cache(tmpdir):
+    from dask_match.io.parquet import clear_cache
+
+    path = str(tmpdir)
+    pd.DataFrame({"a": range(10), "b": range(10)}).to_parquet(
+        os.path.join(path, "part.0.parquet")
+    )
+    assert list(read_parquet(path)._meta.columns) == ["a", "b"]
+
+    new = pd.DataFrame({"c": range(5)})
+    new.to_parquet(os.path.join(path, "part.0.parquet"))
+    clear_cache()
+    assert_eq(read_parquet(path).compute(), new)
+
+    new.to_parquet(os.path.join(path, "part.1.parquet"))
+    clear_cache()
+    assert_eq(read_parquet(path).compute(), pd.concat([new, new]))
+
+
+def test_predicate_pushdown_flipped(tmpdir):
+    from dask_match.io.parquet import ReadParquet
+
+    fn = os.path.join(str(tmpdir), "myfile.parquet")
+    original = pd.DataFrame({"a": range(10), "b": range(10)})
+    original.to_parquet(fn)
+
+    df = read_parquet(fn)
+    y = optimize(df[5 < df.a][df.b <= 8])
+    assert isinstance(y, ReadParquet)
+    assert y.filters == [("a", ">", 5), ("b", "<=", 8)]
+    expected = original[(5 < original.a) & (original.b <= 8)]
+    assert_eq(y.compute(), expected.reset_index(drop=True))
+
+
+def test_getattr_private_skips_meta():
+    x = ReadCSV("myfile.csv")  # no _meta, so a lookup would raise
+
+    assert not hasattr(x, "_repr_html_")
+    assert not hasattr(x, "__array__")
+    with pytest.raises(NotImplementedError):
+        x.foo
+
+
+def test_blockwise_fusion():
+    df = pd.DataFrame({"x": range(20), "y": range(20)})
+    ddf = from_pandas(df, npartitions=3)
+
+    expr = ((ddf.x + 1) * 2 - ddf.y)[ddf.x > 5].sum()
+    fused = optimize(expr, fuse=True)
+
+    # One task per partition for the whole blockwise chain
+    unfused_graph = optimize(expr).__dask_graph__()
+    fused_graph = fused.__dask_graph__()
+    assert len(fused_graph) < len(unfused_graph)
+    assert "Fused" in str(fused)
+
+    assert_eq(fused.compute(), ((df.x + 1) * 2 - df.y)[df.x > 5].sum())
+
+
+def test_blockwise_fusion_shared_input():
+    df = pd.DataFrame({"x": range(20), "y": range(20)})
+    ddf = from_pandas(df, npartitions=2)
+
+    # ``y`` has two consumers and so gets tasks of its own rather than being
+    # computed twice within the output's tasks
+    y = ddf.x + 1
+    expr = (y * 2) + (y - 3)
+    fused = optimize(expr, fuse=True)
+    assert len(fused.__dask_graph__()) == 3 * ddf.npartitions
+
+    assert_eq(fused.compute(), ((df.x + 1) * 2) + ((df.x + 1) - 3))